@@ -0,0 +1,45 @@
+"""
+Convert a whole source tree with one of the Cilk Plus converters.
+
+Shared by cilk_to_openmp.py and cilk_to_openmp_treesitter.py; the
+converter class is passed in, so this module has no dependencies.
+"""
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _convert_one(job):
+    """Convert a single (input, output) pair in a worker process."""
+    converter_cls, input_path, output_path = job
+    converter = converter_cls()
+    count = converter.convert_file(input_path, output_path)
+    return count, converter.warnings
+
+
+def convert_directory(converter_cls, input_dir, output_dir, workers=None):
+    """
+    Convert every .c file under input_dir into the same layout under output_dir.
+
+    Files are independent, so they are spread across worker processes
+    (os.cpu_count() by default), each using a fresh converter_cls().
+    Returns the total number of conversions and the warnings from all
+    files, each prefixed with its input path.
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+
+    jobs = []
+    for input_path in sorted(input_dir.rglob('*.c')):
+        output_path = output_dir / input_path.relative_to(input_dir)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        jobs.append((converter_cls, input_path, output_path))
+
+    total = 0
+    warnings = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_convert_one, jobs, chunksize=8)
+        for (_, input_path, _), (count, file_warnings) in zip(jobs, results):
+            total += count
+            warnings.extend(f'{input_path}: {w}' for w in file_warnings)
+
+    return total, warnings
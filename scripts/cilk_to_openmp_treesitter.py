@@ -9,6 +9,7 @@ Handles:
 
 Usage:
     uv run python scripts/cilk_to_openmp_treesitter.py input.c output.c [--log errors.log]
+    uv run python scripts/cilk_to_openmp_treesitter.py input_dir/ output_dir/ [--jobs N] [--log errors.log]
 """
 
 import re
@@ -19,10 +20,30 @@ from pathlib import Path
 import tree_sitter_c as tsc
 from tree_sitter import Language, Parser
 
+from batch_convert import convert_directory
+
 # Initialize parser
 C_LANGUAGE = Language(tsc.language())
 parser = Parser(C_LANGUAGE)
 
+# Node types whose contents are never converted. Conditional preprocessor
+# blocks (preproc_if, preproc_ifdef, ...) wrap ordinary code and are not listed.
+SKIP_NODE_TYPES = frozenset({
+    'comment',
+    'string_literal',
+    'concatenated_string',
+    'char_literal',
+    'preproc_include',
+    'preproc_def',
+    'preproc_function_def',
+    'preproc_call',
+})
+
+# Match: [type] var = __sec_reduce_add(expr[slice])
+_REDUCTION_RE = re.compile(
+    r'((?:int|double|float)\s+)?(\w+)\s*=\s*__sec_reduce_add\((.+)\[(vALL|\d+:\w+)\]\)\s*;'
+)
+
 
 class TreeSitterCilkConverter:
     def __init__(self, log_file=None):
@@ -30,6 +51,13 @@ class TreeSitterCilkConverter:
         self.warnings = []
         self.conversions = 0
         self.length_var = 'VLENGTH'
+        # The loop bound is fixed, so bake the loop header once
+        self._for_head = f'for (int i = 0; i < {self.length_var}; i++) {{'
+        self._slice_re = re.compile(r'\[\d+:\w+\]')
+        self._cilk_bytes = re.compile(rb'\[vALL\]|\[0:VLENGTH\]|\[\d+:\w+\]')
+        # Bytes \d and \w are ASCII-only, so spans with non-ASCII text are
+        # confirmed against the Unicode-aware str pattern instead
+        self._cilk_text = re.compile(r'\[vALL\]|\[0:VLENGTH\]|\[\d+:\w+\]')
 
     def log(self, msg):
         self.warnings.append(msg)
@@ -37,29 +65,38 @@ class TreeSitterCilkConverter:
     def write_log(self):
         if self.log_file:
             with open(self.log_file, 'w') as f:
-                for w in self.warnings:
-                    f.write(w + '\n')
-                if not self.warnings:
-                    f.write('No warnings\n')
+                f.write('\n'.join(self.warnings or ['No warnings']) + '\n')
 
     def get_indent(self, source_bytes, node):
         """Get the indentation of a node."""
         line_start = source_bytes.rfind(b'\n', 0, node.start_byte) + 1
-        indent_bytes = source_bytes[line_start:node.start_byte]
-        # Only keep whitespace
-        indent = indent_bytes.decode('utf-8', errors='replace')
-        return ''.join(c for c in indent if c in ' \t')
+        # Whitespace is ASCII, so count leading space/tab bytes directly
+        end = line_start
+        while end < node.start_byte and source_bytes[end] in (0x20, 0x09):
+            end += 1
+        return source_bytes[line_start:end].decode('ascii')
 
     def replace_vall(self, text):
         """Replace [vALL] and [0:VLENGTH] with [i]."""
-        text = re.sub(r'\[vALL\]', '[i]', text)
-        text = re.sub(r'\[0:VLENGTH\]', '[i]', text)
-        text = re.sub(r'\[\d+:(\w+)\]', '[i]', text)
+        # MCsquare's two literal slices are plain substring replacements;
+        # only other start:length slices need the regex
+        text = text.replace('[vALL]', '[i]').replace('[0:VLENGTH]', '[i]')
+        if ':' in text:
+            text = self._slice_re.sub('[i]', text)
         return text
 
-    def has_cilk_notation(self, text):
-        """Check if text contains Cilk Plus array notation."""
-        return bool(re.search(r'\[vALL\]|\[0:VLENGTH\]|\[\d+:\w+\]', text))
+    def has_cilk_notation(self, source_bytes, start, end):
+        """Check if source_bytes[start:end] contains Cilk Plus array notation."""
+        # Every form of the notation contains 'vALL' or ':', and a literal
+        # find rules out most nodes without starting the regex engine
+        if source_bytes.find(b'vALL', start, end) < 0 and source_bytes.find(b':', start, end) < 0:
+            return False
+        if self._cilk_bytes.search(source_bytes, start, end) is not None:
+            return True
+        span = source_bytes[start:end]
+        if span.isascii():
+            return False
+        return self._cilk_text.search(span.decode('utf-8', errors='replace')) is not None
 
     def is_reduction(self, text):
         """Check if text contains __sec_reduce_add."""
@@ -67,39 +104,31 @@ class TreeSitterCilkConverter:
 
     def convert_reduction(self, text, indent):
         """Convert __sec_reduce_add to OpenMP SIMD reduction."""
-        # Match: [type] var = __sec_reduce_add(expr[slice])
-        match = re.match(
-            r'((?:int|double|float)\s+)?(\w+)\s*=\s*__sec_reduce_add\((.+)\[(vALL|\d+:\w+)\]\)\s*;',
-            text.strip()
-        )
+        match = _REDUCTION_RE.match(text.strip())
         if not match:
             return None
 
-        type_decl = match.group(1) or ''
-        result_var = match.group(2)
-        array_expr = match.group(3)
+        type_decl, result_var, array_expr, _ = match.groups(default='')
 
-        result = [
-            f'{indent}{type_decl}{result_var} = 0;',
-            f'{indent}#pragma omp simd reduction(+:{result_var})',
-            f'{indent}for (int i = 0; i < {self.length_var}; i++) {{',
-            f'{indent}    {result_var} += {array_expr}[i];',
-            f'{indent}}}'
-        ]
         self.conversions += 1
-        return '\n'.join(result)
+        return (
+            f'{indent}{type_decl}{result_var} = 0;\n'
+            f'{indent}#pragma omp simd reduction(+:{result_var})\n'
+            f'{indent}{self._for_head}\n'
+            f'{indent}    {result_var} += {array_expr}[i];\n'
+            f'{indent}}}'
+        )
 
     def convert_assignment(self, text, indent):
         """Convert Cilk Plus array assignment to OpenMP SIMD loop."""
         converted = self.replace_vall(text.strip())
-        result = [
-            f'{indent}#pragma omp simd',
-            f'{indent}for (int i = 0; i < {self.length_var}; i++) {{',
-            f'{indent}    {converted}',
-            f'{indent}}}'
-        ]
         self.conversions += 1
-        return '\n'.join(result)
+        return (
+            f'{indent}#pragma omp simd\n'
+            f'{indent}{self._for_head}\n'
+            f'{indent}    {converted}\n'
+            f'{indent}}}'
+        )
 
     def convert_if_statement(self, source_bytes, node, indent):
         """Convert if statement with Cilk Plus notation - wrap entire block in loop."""
@@ -111,55 +140,66 @@ class TreeSitterCilkConverter:
         indented_lines = [f'    {line}' if line.strip() else line for line in lines]
         indented_block = '\n'.join(indented_lines)
 
-        result = [
-            f'{indent}#pragma omp simd',
-            f'{indent}for (int i = 0; i < {self.length_var}; i++) {{',
-            f'{indented_block}',
-            f'{indent}}}'
-        ]
         self.conversions += 1
-        return '\n'.join(result)
-
-    def process_node(self, source_bytes, node, replacements):
-        """Recursively process AST nodes, collecting replacements."""
-        text = source_bytes[node.start_byte:node.end_byte].decode('utf-8', errors='replace')
+        return (
+            f'{indent}#pragma omp simd\n'
+            f'{indent}{self._for_head}\n'
+            f'{indented_block}\n'
+            f'{indent}}}'
+        )
 
-        # Check if this node contains Cilk Plus notation
-        if not self.has_cilk_notation(text):
-            return
+    def node_text(self, source_bytes, node):
+        """Decode the source text of a node."""
+        return source_bytes[node.start_byte:node.end_byte].decode('utf-8', errors='replace')
+
+    def _handle_declaration(self, source_bytes, node):
+        """Handle declarations with reductions (int x = __sec_reduce_add(...))."""
+        text = self.node_text(source_bytes, node)
+        if self.is_reduction(text):
+            return self.convert_reduction(text, self.get_indent(source_bytes, node))
+        return None
+
+    def _handle_expression_statement(self, source_bytes, node):
+        """Handle expression statements (assignments and reductions)."""
+        text = self.node_text(source_bytes, node)
+        if self.is_reduction(text):
+            return self.convert_reduction(text, self.get_indent(source_bytes, node))
+        elif '=' in text:
+            return self.convert_assignment(text, self.get_indent(source_bytes, node))
+        return None
+
+    def _handle_if_statement(self, source_bytes, node):
+        """Handle if statements - wrap entire block."""
+        return self.convert_if_statement(source_bytes, node, self.get_indent(source_bytes, node))
+
+    # Convertible node types; each handler returns the replacement text, or
+    # None to descend into the node's children instead
+    _HANDLERS = {
+        'declaration': _handle_declaration,
+        'expression_statement': _handle_expression_statement,
+        'if_statement': _handle_if_statement,
+    }
 
-        indent = self.get_indent(source_bytes, node)
+    def process_node(self, source_bytes, node, replacements):
+        """Walk the AST below node with a tree cursor, collecting replacements."""
+        cursor = node.walk()
 
-        # Handle declarations with reductions (int x = __sec_reduce_add(...))
-        if node.type == 'declaration' and self.is_reduction(text):
-            converted = self.convert_reduction(text, indent)
-            if converted:
-                replacements.append((node.start_byte, node.end_byte, converted))
-                return
+        while True:
+            node = cursor.node
 
-        # Handle expression statements (assignments and reductions)
-        if node.type == 'expression_statement':
-            if self.is_reduction(text):
-                converted = self.convert_reduction(text, indent)
+            # A parent without Cilk notation cannot have a child with one,
+            # so only descend into spans that contain it
+            if node.type not in SKIP_NODE_TYPES and self.has_cilk_notation(source_bytes, node.start_byte, node.end_byte):
+                handler = self._HANDLERS.get(node.type)
+                converted = handler(self, source_bytes, node) if handler else None
                 if converted:
                     replacements.append((node.start_byte, node.end_byte, converted))
-                    return
-            elif '=' in text:
-                converted = self.convert_assignment(text, indent)
-                if converted:
-                    replacements.append((node.start_byte, node.end_byte, converted))
-                    return
+                elif cursor.goto_first_child():
+                    continue
 
-        # Handle if statements - wrap entire block
-        if node.type == 'if_statement':
-            converted = self.convert_if_statement(source_bytes, node, indent)
-            if converted:
-                replacements.append((node.start_byte, node.end_byte, converted))
-                return
-
-        # Recurse into children
-        for child in node.children:
-            self.process_node(source_bytes, child, replacements)
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return
 
     def convert_file(self, input_path, output_path):
         """Convert a C file using tree-sitter parsing."""
@@ -171,13 +211,16 @@ class TreeSitterCilkConverter:
 
         self.process_node(source_bytes, tree.root_node, replacements)
 
-        # Sort replacements by position (reverse order for safe replacement)
-        replacements.sort(key=lambda x: x[0], reverse=True)
+        # Splice replacements in a single forward pass over the source
+        replacements.sort(key=lambda x: x[0])
 
-        # Apply replacements
-        result = source_bytes
+        result = bytearray()
+        cursor = 0
         for start, end, new_text in replacements:
-            result = result[:start] + new_text.encode('utf-8') + result[end:]
+            result += source_bytes[cursor:start]
+            result += new_text.encode('utf-8')
+            cursor = end
+        result += source_bytes[cursor:]
 
         with open(output_path, 'wb') as f:
             f.write(result)
@@ -187,14 +230,20 @@ class TreeSitterCilkConverter:
 
 def main():
     parser_arg = argparse.ArgumentParser(description='Cilk Plus to OpenMP SIMD (tree-sitter)')
-    parser_arg.add_argument('input', help='Input C file')
-    parser_arg.add_argument('output', help='Output C file')
+    parser_arg.add_argument('input', help='Input C file (or directory)')
+    parser_arg.add_argument('output', help='Output C file (or directory)')
     parser_arg.add_argument('--log', default='cilk_convert_ts.log', help='Log file')
+    parser_arg.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes for directory input')
 
     args = parser_arg.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser_arg.error('--jobs must be at least 1')
 
     converter = TreeSitterCilkConverter(log_file=args.log)
-    count = converter.convert_file(args.input, args.output)
+    if Path(args.input).is_dir():
+        count, converter.warnings = convert_directory(TreeSitterCilkConverter, args.input, args.output, args.jobs)
+    else:
+        count = converter.convert_file(args.input, args.output)
     converter.write_log()
 
     print(f"Converted {count} Cilk Plus constructs")
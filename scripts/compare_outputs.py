@@ -1,18 +1,22 @@
 #!/usr/bin/env python3
 """Compare Cilk Plus and OpenMP SIMD outputs with tolerance."""
 
+import re
 import sys
 
+import numpy as np
+
+# KEY=VALUE lines, and the printf %g/%f spellings float() accepts
+PAIR_RE = re.compile(r'^([^=\n]*)=(.*)$', re.M)
+NUMBER_RE = re.compile(r'[-+]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|inf(?:inity)?|nan)', re.I)
+
 def parse_output(filename):
     result = {}
     with open(filename) as f:
-        for line in f:
-            if '=' in line:
-                key, val = line.strip().split('=', 1)
-                try:
-                    result[key] = float(val)
-                except ValueError:
-                    result[key] = val
+        data = f.read()
+    for key, val in PAIR_RE.findall(data):
+        key, val = key.strip(), val.strip()
+        result[key] = float(val) if NUMBER_RE.fullmatch(val) else val
     return result
 
 def main():
@@ -26,6 +30,16 @@ def main():
     tolerance = 1e-12
     passed = True
 
+    # Difference every key both outputs report as a float in one go
+    keys = [k for k in cilk if isinstance(cilk[k], float) and isinstance(openmp.get(k), float)]
+    a = np.fromiter((cilk[k] for k in keys), dtype=np.float64, count=len(keys))
+    b = np.fromiter((openmp[k] for k in keys), dtype=np.float64, count=len(keys))
+    with np.errstate(invalid='ignore', over='ignore'):
+        diffs = np.abs(a - b)
+        rel_diffs = diffs / np.maximum(np.abs(a), 1e-15)
+    exceeded = diffs > tolerance
+    numeric = dict(zip(keys, zip(diffs.tolist(), rel_diffs.tolist(), exceeded.tolist())))
+
     for key in cilk:
         if key not in openmp:
             print(f"MISSING: {key} not in OpenMP output")
@@ -33,10 +47,9 @@ def main():
             continue
 
         cv, ov = cilk[key], openmp[key]
-        if isinstance(cv, float) and isinstance(ov, float):
-            diff = abs(cv - ov)
-            rel_diff = diff / max(abs(cv), 1e-15)
-            if diff > tolerance:
+        if key in numeric:
+            diff, rel_diff, exceeded = numeric[key]
+            if exceeded:
                 print(f"MISMATCH: {key} cilk={cv} openmp={ov} diff={diff:.2e} rel={rel_diff:.2e}")
                 passed = False
             else: